@@ -21,7 +21,10 @@ class Config(PluginConfig):
         'include_interfaces_panel': False,
         # Consider component descriptions when comparing. If this option is set to True, then take into account
         # component descriptions when comparing components and synchronizing their attributes, otherwise - ignore
-        'sync_descriptions': True
+        'sync_descriptions': True,
+        # Maximum number of components created, deleted or synced in a single database transaction.
+        # Large synchronizations are split into chunks of this size, and an interrupted one can be resumed
+        'sync_batch_size': 100
     }
 
 
@@ -1,30 +1,17 @@
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Type
 
 import attr
 from attrs import fields
-from django.conf import settings
+from django.db.models import Model, QuerySet
 
 from netbox.models import PrimaryModel
 
-config = settings.PLUGINS_CONFIG["netbox_interface_sync"]
-SYNC_DESCRIPTIONS: bool = config["sync_descriptions"]
+from .plugin_config import get_config
 
 
-@attr.s(frozen=True, auto_attribs=True)
 class BaseComparison:
-    """Common fields of a device component"""
-    # Do not compare IDs
-    id: int = attr.ib(eq=False, metadata={'printable': False, 'netbox_exportable': False})
-    # Compare names case-insensitively and spaces-insensitively
-    name: str = attr.ib(metadata={'printable': False})
-    label: str = attr.ib()
-    # Compare descriptions if it is set by the configuration
-    description: str = attr.ib(eq=SYNC_DESCRIPTIONS, metadata={'synced': SYNC_DESCRIPTIONS})
-    # Do not compare `is_template` properties
-    is_template: bool = attr.ib(
-        default=False, kw_only=True, eq=False,
-        metadata={'printable': False, 'netbox_exportable': False}
-    )
+    """Common methods of the comparison classes, which are built by `build_comparison_classes()`"""
 
     @property
     def fields_display(self) -> str:
@@ -57,87 +44,177 @@ class BaseComparison:
         return attr.asdict(self, recurse=True, filter=field_filter)
 
 
-@attr.s(frozen=True, auto_attribs=True)
-class BaseTypedComparison(BaseComparison):
-    """Common fields of a device typed component"""
-    type: str = attr.ib(metadata={'printable': False})
-    type_display: str = attr.ib(eq=False, metadata={'displayed_caption': 'Type', 'netbox_exportable': False})
-
+@lru_cache(maxsize=None)
+def build_comparison_classes(sync_descriptions: bool) -> Dict[str, Type[BaseComparison]]:
+    """
+    Builds the comparison classes for the given configuration.
+    Returns a dict of comparison classes by their names
+    :param sync_descriptions: compare and sync component descriptions
+    """
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class ComponentComparison(BaseComparison):
+        """Common fields of a device component"""
+        # Do not compare IDs
+        id: int = attr.ib(eq=False, metadata={'printable': False, 'netbox_exportable': False})
+        # Compare names case-insensitively and spaces-insensitively
+        name: str = attr.ib(metadata={'printable': False})
+        label: str = attr.ib()
+        # Compare descriptions if it is set by the configuration
+        description: str = attr.ib(eq=sync_descriptions, metadata={'synced': sync_descriptions})
+        # Do not compare `is_template` properties
+        is_template: bool = attr.ib(
+            default=False, kw_only=True, eq=False,
+            metadata={'printable': False, 'netbox_exportable': False, 'fetched': False}
+        )
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class BaseTypedComparison(ComponentComparison):
+        """Common fields of a device typed component"""
+        type: str = attr.ib(metadata={'printable': False})
+        # `get_type_display()` is computed from the `type` column, so there is nothing else to fetch
+        type_display: str = attr.ib(
+            eq=False, metadata={'displayed_caption': 'Type', 'netbox_exportable': False, 'fetched': False}
+        )
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class ConsolePortComparison(BaseTypedComparison):
+        """A unified way to represent the consoleport and consoleport template"""
+        pass
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class ConsoleServerPortComparison(BaseTypedComparison):
+        """A unified way to represent the consoleserverport and consoleserverport template"""
+        pass
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class PowerPortComparison(BaseTypedComparison):
+        """A unified way to represent the power port and power port template"""
+        maximum_draw: str = attr.ib()
+        allocated_draw: str = attr.ib()
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class PowerOutletComparison(BaseTypedComparison):
+        """A unified way to represent the power outlet and power outlet template"""
+        power_port: PowerPortComparison = attr.ib()
+        feed_leg: str = attr.ib()
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class InterfaceComparison(BaseTypedComparison):
+        """A unified way to represent the interface and interface template"""
+        mgmt_only: bool = attr.ib()
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class FrontPortComparison(BaseTypedComparison):
+        """A unified way to represent the front port and front port template"""
+        color: str = attr.ib()
+        # rear_port_id: int
+        rear_port_position: int = attr.ib(metadata={'displayed_caption': 'Position'})
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class RearPortComparison(BaseTypedComparison):
+        """A unified way to represent the rear port and rear port template"""
+        color: str = attr.ib()
+        positions: int = attr.ib()
+
+    @attr.s(frozen=True, auto_attribs=True)
+    class DeviceBayComparison(ComponentComparison):
+        """A unified way to represent the device bay and device bay template"""
+        pass
+
+    return {
+        comparison.__name__: comparison
+        for comparison in (
+            ComponentComparison, BaseTypedComparison, ConsolePortComparison, ConsoleServerPortComparison,
+            PowerPortComparison, PowerOutletComparison, InterfaceComparison, FrontPortComparison,
+            RearPortComparison, DeviceBayComparison
+        )
+    }
 
-@attr.s(frozen=True, auto_attribs=True)
-class ConsolePortComparison(BaseTypedComparison):
-    """A unified way to represent the consoleport and consoleport template"""
-    pass
 
+def get_comparison_classes() -> Dict[str, Type[BaseComparison]]:
+    """Returns the comparison classes for the current plugin configuration, building them on first use"""
+    return build_comparison_classes(get_config().sync_descriptions)
 
-@attr.s(frozen=True, auto_attribs=True)
-class ConsoleServerPortComparison(BaseTypedComparison):
-    """A unified way to represent the consoleserverport and consoleserverport template"""
-    pass
 
+def __getattr__(name: str):
+    """Resolves the comparison classes (for example, `comparison.InterfaceComparison`) lazily"""
+    if name.endswith("Comparison") and name in get_comparison_classes():
+        return get_comparison_classes()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-@attr.s(frozen=True, auto_attribs=True)
-class PowerPortComparison(BaseTypedComparison):
-    """A unified way to represent the power port and power port template"""
-    maximum_draw: str = attr.ib()
-    allocated_draw: str = attr.ib()
 
+# Names of the comparison classes by the NetBox component model names
+COMPARISON_TYPE_MAP = {
+    "DeviceBay": "DeviceBayComparison",
+    "Interface": "InterfaceComparison",
+    "FrontPort": "FrontPortComparison",
+    "RearPort": "RearPortComparison",
+    "ConsolePort": "ConsolePortComparison",
+    "ConsoleServerPort": "ConsoleServerPortComparison",
+    "PowerPort": "PowerPortComparison",
+    "PowerOutlet": "PowerOutletComparison"
+}
 
-@attr.s(frozen=True, auto_attribs=True)
-class PowerOutletComparison(BaseTypedComparison):
-    """A unified way to represent the power outlet and power outlet template"""
-    power_port: PowerPortComparison = attr.ib()
-    feed_leg: str = attr.ib()
 
+def get_comparison_class(model) -> Tuple[Optional[Type[BaseComparison]], bool]:
+    """
+    Returns the comparison class for a NetBox component (or component template) model or instance
+    and whether it is a template
+    """
+    obj_name = model._meta.object_name
+    if obj_name.endswith("Template"):
+        is_template = True
+        obj_name = obj_name[:-8]  # TODO: use `removesuffix` introduced in Python 3.9
+    else:
+        is_template = False
 
-@attr.s(frozen=True, auto_attribs=True)
-class InterfaceComparison(BaseTypedComparison):
-    """A unified way to represent the interface and interface template"""
-    mgmt_only: bool = attr.ib()
+    comparison_name = COMPARISON_TYPE_MAP.get(obj_name)
+    return (get_comparison_classes()[comparison_name] if comparison_name else None), is_template
 
 
-@attr.s(frozen=True, auto_attribs=True)
-class FrontPortComparison(BaseTypedComparison):
-    """A unified way to represent the front port and front port template"""
-    color: str = attr.ib()
-    # rear_port_id: int
-    rear_port_position: int = attr.ib(metadata={'displayed_caption': 'Position'})
+@lru_cache(maxsize=None)
+def get_fetched_fields(comparison: Type[BaseComparison], prefix: str = "") -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Derives the model columns needed to build a comparison object from the attrs fields of its class.
+    Returns a tuple of (`only()` field paths, `select_related()` relation paths). The result is computed once per class
+    :param comparison: comparison class
+    :param prefix: lookup prefix of the nested relation (for example, "power_port__")
+    """
+    only_fields = []
+    related_fields = []
+    for field in fields(comparison):
+        if not field.metadata.get('fetched', True):
+            continue
+        if isinstance(field.type, type) and issubclass(field.type, BaseComparison):
+            # Related component (for example, the power port of a power outlet): join it and fetch its fields too
+            related_path = f"{prefix}{field.name}"
+            nested_only_fields, nested_related_fields = get_fetched_fields(field.type, f"{related_path}__")
+            only_fields.append(related_path)
+            only_fields.extend(nested_only_fields)
+            related_fields.append(related_path)
+            related_fields.extend(nested_related_fields)
+        else:
+            only_fields.append(f"{prefix}{field.name}")
 
+    return tuple(only_fields), tuple(related_fields)
 
-@attr.s(frozen=True, auto_attribs=True)
-class RearPortComparison(BaseTypedComparison):
-    """A unified way to represent the rear port and rear port template"""
-    color: str = attr.ib()
-    positions: int = attr.ib()
 
+def project_queryset(queryset: QuerySet) -> QuerySet:
+    """Restricts the queryset to the columns that are read by the corresponding comparison class"""
+    comparison, _ = get_comparison_class(queryset.model)
+    if not comparison:
+        return queryset
 
-@attr.s(frozen=True, auto_attribs=True)
-class DeviceBayComparison(BaseComparison):
-    """A unified way to represent the device bay and device bay template"""
-    pass
+    only_fields, related_fields = get_fetched_fields(comparison)
+    if related_fields:
+        queryset = queryset.select_related(*related_fields)
+    return queryset.only(*only_fields)
 
 
 def from_netbox_object(netbox_object: PrimaryModel) -> Optional[BaseComparison]:
     """Makes a comparison object from the NetBox object"""
-    type_map = {
-        "DeviceBay": DeviceBayComparison,
-        "Interface": InterfaceComparison,
-        "FrontPort": FrontPortComparison,
-        "RearPort": RearPortComparison,
-        "ConsolePort": ConsolePortComparison,
-        "ConsoleServerPort": ConsoleServerPortComparison,
-        "PowerPort": PowerPortComparison,
-        "PowerOutlet": PowerOutletComparison
-    }
-
-    obj_name = netbox_object._meta.object_name
-    if obj_name.endswith("Template"):
-        is_template = True
-        obj_name = obj_name[:-8]  # TODO: use `removesuffix` introduced in Python 3.9
-    else:
-        is_template = False
-
-    comparison = type_map.get(obj_name)
+    comparison, is_template = get_comparison_class(netbox_object)
     if not comparison:
         return
 
@@ -149,7 +226,8 @@ def from_netbox_object(netbox_object: PrimaryModel) -> Optional[BaseComparison]:
             values[field.name] = netbox_object.get_type_display()
         else:
             field_value = getattr(netbox_object, field.name)
-            if isinstance(field_value, PrimaryModel):
+            # Related components and component templates (for example, the power port of a power outlet)
+            if isinstance(field_value, Model):
                 field_value = from_netbox_object(field_value)
             values[field.name] = field_value
 
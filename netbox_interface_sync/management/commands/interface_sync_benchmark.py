@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Model, QuerySet
+
+from dcim.models import Device
+
+from ... import comparison, views
+
+BENCHMARKED_VIEWS = (
+    views.ConsolePortComparisonView,
+    views.ConsoleServerPortComparisonView,
+    views.InterfaceComparisonView,
+    views.PowerPortComparisonView,
+    views.PowerOutletComparisonView,
+    views.RearPortComparisonView,
+    views.DeviceBayComparisonView,
+)
+
+
+def loaded_values(obj: Model) -> list:
+    """Returns the column values hydrated into the model instance, including the ones of joined relations"""
+    values = [value for key, value in obj.__dict__.items() if not key.startswith('_')]
+    for related_obj in obj._state.fields_cache.values():
+        if isinstance(related_obj, Model):
+            values.extend(loaded_values(related_obj))
+    return values
+
+
+def measure(queryset: QuerySet, iterations: int):
+    """
+    Fetches the queryset and converts its rows into comparison objects `iterations` times.
+    Returns a tuple of (number of rows, average columns per row, average characters per row, best time in seconds).
+    Row size is approximated by the length of the `str()` of the loaded values
+    """
+    best_time = None
+    rows = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows = list(queryset.all())
+        for obj in rows:
+            comparison.from_netbox_object(obj)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    if not rows:
+        return 0, 0, 0, best_time or 0
+    columns = sum(len(loaded_values(obj)) for obj in rows)
+    chars = sum(len(str(value)) for obj in rows for value in loaded_values(obj))
+    return len(rows), columns / len(rows), chars / len(rows), best_time
+
+
+class Command(BaseCommand):
+    help = "Compare fetching full component rows with the field-projected fetch used by the comparison views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_id', type=int, help="ID of the device whose components are compared")
+        parser.add_argument('--iterations', type=int, default=5, help="Number of runs; the best time is reported")
+
+    def handle(self, *args, **options):
+        try:
+            device = Device.objects.get(id=options['device_id'])
+        except Device.DoesNotExist:
+            raise CommandError(f"Device with ID {options['device_id']} does not exist")
+
+        self.stdout.write(
+            f"{'Model':<28}{'Rows':>7}{'Cols full':>11}{'Cols only':>11}"
+            f"{'Chars full':>12}{'Chars only':>12}{'ms full':>10}{'ms only':>10}"
+        )
+        for view in BENCHMARKED_VIEWS:
+            querysets = (
+                (view.obj_template_model, view.obj_template_model.objects.filter(device_type_id=device.device_type_id)),
+                (view.obj_model, view.obj_model.objects.filter(device_id=device.id)),
+            )
+            for model, queryset in querysets:
+                # Join the same relations in both runs, so that they differ only in the fetched columns
+                _, related_fields = comparison.get_fetched_fields(comparison.get_comparison_class(model)[0])
+                full_queryset = queryset.select_related(*related_fields) if related_fields else queryset
+                rows, full_columns, full_chars, full_time = measure(full_queryset, options['iterations'])
+                _, only_columns, only_chars, only_time = measure(
+                    comparison.project_queryset(queryset), options['iterations']
+                )
+                self.stdout.write(
+                    f"{model._meta.object_name:<28}{rows:>7}{full_columns:>11.1f}{only_columns:>11.1f}"
+                    f"{full_chars:>12.1f}{only_chars:>12.1f}{full_time * 1000:>10.2f}{only_time * 1000:>10.2f}"
+                )
@@ -0,0 +1,94 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter (with `-X importtime`), so that nothing has been imported or set up yet
+MEASURE_SCRIPT = '''
+import json, time
+
+timings = {}
+start = time.perf_counter()
+from django.conf import settings
+# NetBox settings import the plugin packages to validate their configuration
+settings.INSTALLED_APPS
+timings['load settings (imports plugin packages)'] = time.perf_counter() - start
+
+import django
+from netbox_interface_sync import Config
+
+original_ready = Config.ready
+
+
+def timed_ready(self):
+    ready_start = time.perf_counter()
+    original_ready(self)
+    timings['plugin ready() (registration)'] = time.perf_counter() - ready_start
+
+
+Config.ready = timed_ready
+start = time.perf_counter()
+django.setup()
+timings['django.setup()'] = time.perf_counter() - start
+
+# The URLconf (and the views) are loaded on the first request
+start = time.perf_counter()
+import netbox_interface_sync.urls
+timings['import urls and views (first request)'] = time.perf_counter() - start
+
+from netbox_interface_sync import comparison, plugin_config
+start = time.perf_counter()
+plugin_config.get_config()
+for comparison_class in comparison.get_comparison_classes().values():
+    comparison.get_fetched_fields(comparison_class)
+timings['first use: config, comparison classes and field plans'] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+# `-X importtime` line: "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s+(netbox_interface_sync\S*)$')
+
+
+class Command(BaseCommand):
+    help = "Measure plugin registration, module import times and the cost of compiling its configuration " \
+           "on first use"
+    # System checks load the URLconf, but the measurements run in fresh interpreters anyway
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters to measure")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        step_timings = defaultdict(list)
+        module_timings = defaultdict(list)
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', MEASURE_SCRIPT],
+                env=env, capture_output=True, text=True
+            )
+            if result.returncode:
+                raise CommandError(f"Measurement failed:\n{result.stderr}")
+            for step, seconds in json.loads(result.stdout.splitlines()[-1]).items():
+                step_timings[step].append(seconds * 1000)
+            for line in result.stderr.splitlines():
+                match = IMPORTTIME_RE.match(line)
+                if match:
+                    # Self and cumulative import times of the plugin modules, whenever they were imported
+                    module_timings[match.group(3)].append((int(match.group(1)) / 1000, int(match.group(2)) / 1000))
+
+        self.stdout.write(f"{'Step':<60}{'min ms':>10}{'median ms':>12}")
+        for step, timings in step_timings.items():
+            self.stdout.write(f"{step:<60}{min(timings):>10.2f}{statistics.median(timings):>12.2f}")
+
+        self.stdout.write(f"\n{'Module':<60}{'self ms':>10}{'cumulative ms':>16}")
+        for module, timings in sorted(module_timings.items()):
+            self.stdout.write(
+                f"{module:<60}{statistics.median(t[0] for t in timings):>10.2f}"
+                f"{statistics.median(t[1] for t in timings):>16.2f}"
+            )
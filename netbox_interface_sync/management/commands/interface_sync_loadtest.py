@@ -0,0 +1,278 @@
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from dcim.models import (Device, DeviceRole, DeviceType, Interface, InterfaceTemplate, Manufacturer, PowerOutlet,
+                         PowerOutletTemplate, PowerPortTemplate, Site)
+
+from ...views import SYNC_LOCKED_MESSAGE_TAG
+
+# All objects created by the harness share this prefix, so that they can be found and removed later
+SEED_PREFIX = 'loadtest-'
+LOADTEST_USERNAME = 'netbox-interface-sync-loadtest'
+# Views under test: URL name and the component and component template models whose IDs are posted
+LOADTEST_VIEWS = {
+    'interface_comparison': (Interface, InterfaceTemplate),
+    'poweroutlet_comparison': (PowerOutlet, PowerOutletTemplate),
+}
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries of the current thread's connection"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LockWaitMonitor(threading.Thread):
+    """
+    Periodically samples which worker database sessions are waiting for a lock in PostgreSQL
+    and attributes each waiting sample to the view and method the worker is requesting
+    """
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        # Requests in flight by the backend PIDs of the worker connections
+        self.active_requests = {}
+        self.active_requests_lock = threading.Lock()
+        self.wait_samples = defaultdict(int)
+        self.stopped = threading.Event()
+
+    def start_request(self, pid: int, request_key: tuple):
+        with self.active_requests_lock:
+            self.active_requests[pid] = request_key
+
+    def finish_request(self, pid: int):
+        with self.active_requests_lock:
+            self.active_requests.pop(pid, None)
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                with self.active_requests_lock:
+                    active_requests = dict(self.active_requests)
+                if active_requests:
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT pid FROM pg_stat_activity "
+                            "WHERE datname = current_database() AND wait_event_type = 'Lock' AND pid = ANY(%s)",
+                            (list(active_requests),)
+                        )
+                        for pid, in cursor.fetchall():
+                            self.wait_samples[active_requests[pid]] += 1
+                self.stopped.wait(self.interval)
+        finally:
+            connection.close()
+
+    def wait_time(self, request_key: tuple) -> float:
+        """Estimated time (in seconds) the requests to the view spent waiting for database locks"""
+        return self.wait_samples[request_key] * self.interval
+
+
+class Command(BaseCommand):
+    help = "Seed a local database with a synthetic fleet and drive concurrent comparison and sync traffic " \
+           "through the plugin views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="Create the synthetic fleet before the run")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the synthetic fleet and exit")
+        parser.add_argument('--devices', type=int, default=20, help="Number of devices to seed")
+        parser.add_argument('--interfaces', type=int, default=48, help="Number of interface templates to seed")
+        parser.add_argument('--power-outlets', type=int, default=8, help="Number of power outlet templates to seed")
+        parser.add_argument('--operators', type=int, default=50, help="Number of concurrent interactive users")
+        parser.add_argument('--batch-workers', type=int, default=1,
+                            help="Number of concurrent automation workers which only submit syncs")
+        parser.add_argument('--requests', type=int, default=20, help="Number of requests per operator")
+        parser.add_argument('--batch-requests', type=int, default=50, help="Number of requests per batch worker")
+        parser.add_argument('--post-ratio', type=float, default=0.2, help="Share of operator requests that are syncs")
+        parser.add_argument('--random-seed', type=int, default=None, help="Seed of the traffic generator")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.cleanup()
+            return
+        if options['seed']:
+            self.seed(options['devices'], options['interfaces'], options['power_outlets'])
+
+        device_ids = list(Device.objects.filter(name__startswith=SEED_PREFIX).values_list('id', flat=True))
+        if not device_ids:
+            raise CommandError("No synthetic devices found, run the command with --seed first")
+
+        self.user, _ = get_user_model().objects.get_or_create(
+            username=LOADTEST_USERNAME, defaults={'is_superuser': True, 'is_staff': True}
+        )
+        # The test client must use a host name that passes ALLOWED_HOSTS validation
+        self.server_name = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'testserver').lstrip('.')
+        self.results = defaultdict(list)
+        self.results_lock = threading.Lock()
+
+        self.monitor = LockWaitMonitor() if connection.vendor == 'postgresql' else None
+        if self.monitor:
+            self.monitor.start()
+
+        # Each worker gets its own generator, so that a seeded run sends the same requests from every worker
+        worker_plans = [(options['requests'], options['post_ratio'])] * options['operators']
+        worker_plans += [(options['batch_requests'], 1.0)] * options['batch_workers']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(worker_plans)) as executor:
+            workers = [
+                executor.submit(
+                    self.run_worker, device_ids, requests, post_ratio,
+                    random.Random(f"{options['random_seed']}:{i}" if options['random_seed'] is not None else None)
+                )
+                for i, (requests, post_ratio) in enumerate(worker_plans)
+            ]
+            for worker in workers:
+                worker.result()
+        elapsed = time.perf_counter() - start
+
+        if self.monitor:
+            self.monitor.stopped.set()
+            self.monitor.join()
+        self.report(elapsed)
+
+    def seed(self, devices: int, interfaces: int, power_outlets: int):
+        """Creates a device type with component templates and devices whose components partially drift from it"""
+        site, _ = Site.objects.get_or_create(name=f'{SEED_PREFIX}site', slug=f'{SEED_PREFIX}site')
+        manufacturer, _ = Manufacturer.objects.get_or_create(
+            name=f'{SEED_PREFIX}manufacturer', slug=f'{SEED_PREFIX}manufacturer'
+        )
+        device_role, _ = DeviceRole.objects.get_or_create(name=f'{SEED_PREFIX}role', slug=f'{SEED_PREFIX}role')
+        device_type, created = DeviceType.objects.get_or_create(
+            manufacturer=manufacturer, model=f'{SEED_PREFIX}chassis', slug=f'{SEED_PREFIX}chassis'
+        )
+        if created:
+            InterfaceTemplate.objects.bulk_create(
+                InterfaceTemplate(device_type=device_type, name=f'Ethernet{i}', type='1000base-t')
+                for i in range(1, interfaces + 1)
+            )
+            power_port = PowerPortTemplate.objects.create(device_type=device_type, name='PSU1', type='iec-60320-c14')
+            PowerOutletTemplate.objects.bulk_create(
+                PowerOutletTemplate(device_type=device_type, name=f'Outlet{i}', type='iec-60320-c13',
+                                    power_port=power_port)
+                for i in range(1, power_outlets + 1)
+            )
+
+        existing_devices = Device.objects.filter(name__startswith=SEED_PREFIX).count()
+        for i in range(existing_devices, devices):
+            # Components are instantiated from the templates when a device is created
+            device = Device.objects.create(
+                name=f'{SEED_PREFIX}device{i}', device_type=device_type, device_role=device_role, site=site
+            )
+            # Introduce drift: missing, extra and modified components
+            device_interfaces = list(Interface.objects.filter(device=device).order_by('id'))
+            Interface.objects.filter(id__in=[interface.id for interface in device_interfaces[::7]]).delete()
+            Interface.objects.filter(id__in=[interface.id for interface in device_interfaces[1::5]]).update(
+                description='drift'
+            )
+            Interface.objects.create(device=device, name=f'Extra{i}', type='1000base-t')
+            PowerOutlet.objects.filter(
+                id__in=PowerOutlet.objects.filter(device=device).order_by('id').values_list('id', flat=True)[:1]
+            ).delete()
+
+        self.stdout.write(f"Synthetic fleet: {devices} devices of type {device_type}")
+
+    def cleanup(self):
+        deleted_count = Device.objects.filter(name__startswith=SEED_PREFIX).delete()[0]
+        deleted_count += DeviceType.objects.filter(slug__startswith=SEED_PREFIX).delete()[0]
+        for model in (DeviceRole, Manufacturer, Site):
+            deleted_count += model.objects.filter(slug__startswith=SEED_PREFIX).delete()[0]
+        get_user_model().objects.filter(username=LOADTEST_USERNAME).delete()
+        self.stdout.write(f"Deleted {deleted_count} objects")
+
+    @staticmethod
+    def make_post_data(view_name: str, device_id: int, rng: random.Random) -> dict:
+        """Selects a random subset of the device components to sync and a random subset of templates to add"""
+        model, template_model = LOADTEST_VIEWS[view_name]
+        component_ids = list(model.objects.filter(device_id=device_id).values_list('id', flat=True))
+        template_ids = list(
+            template_model.objects.filter(device_type__instances__id=device_id).values_list('id', flat=True)
+        )
+        return {
+            'sync': rng.sample(component_ids, min(len(component_ids), 5)),
+            'add': rng.sample(template_ids, min(len(template_ids), 2)),
+        }
+
+    def run_worker(self, device_ids: list, requests: int, post_ratio: float, rng: random.Random):
+        client = Client(SERVER_NAME=self.server_name, raise_request_exception=False)
+        client.force_login(self.user)
+        try:
+            for _ in range(requests):
+                view_name = rng.choice(list(LOADTEST_VIEWS))
+                device_id = rng.choice(device_ids)
+                url = reverse(f'plugins:netbox_interface_sync:{view_name}', kwargs={'device_id': device_id})
+                method = 'POST' if rng.random() < post_ratio else 'GET'
+                data = self.make_post_data(view_name, device_id, rng) if method == 'POST' else None
+
+                if self.monitor:
+                    # The backend PID may change if the connection has been reopened
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT pg_backend_pid()')
+                        pid = cursor.fetchone()[0]
+                    self.monitor.start_request(pid, (view_name, method))
+                counter = QueryCounter()
+                try:
+                    with connection.execute_wrapper(counter):
+                        start = time.perf_counter()
+                        response = client.post(url, data) if method == 'POST' else client.get(url)
+                        latency = time.perf_counter() - start
+                finally:
+                    if self.monitor:
+                        self.monitor.finish_request(pid)
+
+                # Only look at the messages added by this request: the POST redirects, so messages stored by
+                # earlier requests of the client are loaded again but not consumed
+                lock_rejected = method == 'POST' and any(
+                    SYNC_LOCKED_MESSAGE_TAG in (message.extra_tags or '').split()
+                    for message in getattr(getattr(response.wsgi_request, '_messages', None), '_queued_messages', ())
+                )
+                with self.results_lock:
+                    self.results[(view_name, method)].append(
+                        (latency, counter.count, response.status_code >= 500, lock_rejected)
+                    )
+        finally:
+            connection.close()
+
+    def report(self, elapsed: float):
+        self.stdout.write(
+            f"{'View':<24}{'Method':<8}{'Requests':>10}{'Req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'Queries':>9}{'Errors':>8}{'Locked':>8}{'Lock wait ms':>14}"
+        )
+        for (view_name, method), results in sorted(self.results.items()):
+            latencies = [latency * 1000 for latency, _, _, _ in results]
+            self.stdout.write(
+                f"{view_name:<24}{method:<8}{len(results):>10}{len(results) / elapsed:>9.1f}"
+                f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+                f"{sum(queries for _, queries, _, _ in results) / len(results):>9.1f}"
+                f"{sum(error for _, _, error, _ in results):>8}{sum(locked for _, _, _, locked in results):>8}"
+                f"{self.monitor.wait_time((view_name, method)) * 1000 if self.monitor else float('nan'):>14.0f}"
+            )
+
+        total_requests = sum(len(results) for results in self.results.values())
+        self.stdout.write(f"Total: {total_requests} requests in {elapsed:.2f} s ({total_requests / elapsed:.1f} req/s)")
+        if self.monitor:
+            self.stdout.write(
+                f"Lock wait is estimated by sampling pg_stat_activity of the worker sessions every "
+                f"{self.monitor.interval * 1000:.0f} ms"
+            )
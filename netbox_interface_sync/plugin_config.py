@@ -0,0 +1,86 @@
+from collections.abc import Mapping
+from functools import lru_cache
+
+import attr
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+PLUGIN_NAME = 'netbox_interface_sync'
+
+
+def _positive_int(instance, attribute: attr.Attribute, value: int):
+    # `bool` is a subclass of `int`, but `True` is not a meaningful batch size
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f"'{attribute.name}' must be an integer, got {value!r}")
+    if value <= 0:
+        raise ValueError(f"'{attribute.name}' must be a positive integer, got {value!r}")
+
+
+@attr.s(frozen=True, auto_attribs=True)
+class PluginSettings:
+    """Validated plugin configuration, compiled from `PLUGINS_CONFIG`"""
+    name_case_insensitive: bool = attr.ib(
+        validator=attr.validators.instance_of(bool), metadata={'setting': 'name_comparison["case-insensitive"]'}
+    )
+    name_space_insensitive: bool = attr.ib(
+        validator=attr.validators.instance_of(bool), metadata={'setting': 'name_comparison["space-insensitive"]'}
+    )
+    exclude_virtual_interfaces: bool = attr.ib(validator=attr.validators.instance_of(bool))
+    include_interfaces_panel: bool = attr.ib(validator=attr.validators.instance_of(bool))
+    sync_descriptions: bool = attr.ib(validator=attr.validators.instance_of(bool))
+    sync_batch_size: int = attr.ib(validator=_positive_int)
+
+    def name_key(self, name: str) -> str:
+        """Key by which components of the device type and the device are matched"""
+        if self.name_case_insensitive:
+            name = name.lower()
+        if self.name_space_insensitive:
+            name = name.replace(' ', '')
+        return name
+
+
+def compile_config(plugin_config: dict) -> PluginSettings:
+    """
+    Validates the raw plugin configuration and compiles it into `PluginSettings`
+    :param plugin_config: the plugin's `PLUGINS_CONFIG` entry. Missing settings take their default values
+    """
+    from . import Config
+
+    plugin_config = {**Config.default_settings, **plugin_config}
+    name_comparison = plugin_config['name_comparison']
+    if not isinstance(name_comparison, Mapping):
+        raise ImproperlyConfigured(
+            f"Invalid {PLUGIN_NAME} configuration: 'name_comparison' must be a dict, got {name_comparison!r}"
+        )
+    try:
+        return PluginSettings(
+            name_case_insensitive=name_comparison.get('case-insensitive', False),
+            name_space_insensitive=name_comparison.get('space-insensitive', False),
+            exclude_virtual_interfaces=plugin_config['exclude_virtual_interfaces'],
+            include_interfaces_panel=plugin_config['include_interfaces_panel'],
+            sync_descriptions=plugin_config['sync_descriptions'],
+            sync_batch_size=plugin_config['sync_batch_size'],
+        )
+    except (TypeError, ValueError) as e:
+        message = e.args[0]
+        if len(e.args) == 4 and isinstance(e.args[1], attr.Attribute):
+            # `instance_of` error: name the setting as it is written in `PLUGINS_CONFIG`
+            attribute, expected_type, value = e.args[1:]
+            setting = attribute.metadata.get('setting', attribute.name)
+            message = f"'{setting}' must be {expected_type.__name__}, got {value!r}"
+        raise ImproperlyConfigured(f"Invalid {PLUGIN_NAME} configuration: {message}")
+
+
+@lru_cache(maxsize=None)
+def get_config() -> PluginSettings:
+    """Returns the compiled plugin configuration. It is compiled on first use and cached until settings change"""
+    return compile_config(settings.PLUGINS_CONFIG.get(PLUGIN_NAME, {}))
+
+
+@receiver(setting_changed)
+def reset_config(setting: str, **kwargs):
+    """Drops the compiled configuration when `PLUGINS_CONFIG` is changed (for example, by `override_settings`)"""
+    if setting == 'PLUGINS_CONFIG':
+        get_config.cache_clear()
@@ -1,6 +1,8 @@
 from extras.plugins import PluginTemplateExtension
 from dcim.models import Interface, InterfaceTemplate
 
+from .plugin_config import get_config
+
 
 class DeviceViewExtension(PluginTemplateExtension):
     model = "dcim.device"
@@ -14,6 +16,10 @@ class DeviceViewExtension(PluginTemplateExtension):
 
     def right_page(self):
         """Implements a panel with the number of interfaces on the right side of the page"""
+        plugin_config = get_config()
+        if not plugin_config.include_interfaces_panel:
+            return ""
+
         obj = self.context['object']
         interfaces = Interface.objects.filter(device=obj)
         real_interfaces = interfaces.exclude(type__in=["virtual", "lag"])
@@ -22,7 +28,8 @@ class DeviceViewExtension(PluginTemplateExtension):
         return self.render("netbox_interface_sync/number_of_interfaces_panel.html", extra_context={
             "interfaces": interfaces,
             "real_interfaces": real_interfaces,
-            "interface_templates": interface_templates
+            "interface_templates": interface_templates,
+            "exclude_virtual_interfaces": plugin_config.exclude_virtual_interfaces
         })
 
 
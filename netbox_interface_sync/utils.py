@@ -1,8 +1,11 @@
 import re
-from typing import Iterable, List
-from django.conf import settings
-
-config = settings.PLUGINS_CONFIG['netbox_interface_sync']
+import uuid
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, List
+from django.core.cache import cache
+from django.db import connection
 
 
 def split(s):
@@ -23,6 +26,13 @@ def make_integer_list(lst: List[str]):
     return [int(i) for i in lst if i.isdigit()]
 
 
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
 def get_permissions_for_model(model, actions: Iterable[str]) -> List[str]:
     """
     Resolve a list of permissions for a given model (or instance).
@@ -37,3 +47,43 @@ def get_permissions_for_model(model, actions: Iterable[str]) -> List[str]:
         permissions.append(f'{model._meta.app_label}.{action}_{model._meta.model_name}')
 
     return permissions
+
+
+# How long a fallback (cache-based) sync lock is held if its owner dies without releasing it (in seconds)
+SYNC_LOCK_TIMEOUT = 60 * 60
+
+
+@contextmanager
+def sync_lock(model, device_id: int) -> Iterator[bool]:
+    """
+    Non-blocking lock that serializes synchronizations of one component type on one device.
+    Yields True if the lock has been acquired, False if another synchronization holds it.
+
+    PostgreSQL session-level advisory locks are used, so the lock is released even if the worker dies.
+    Other databases fall back to an atomic `cache.add()`.
+
+    :param model: A component model or instance
+    :param device_id: ID of the device being synchronized
+    """
+    # Advisory lock keys are two signed 32-bit integers: the component type and the device
+    model_key = zlib.crc32(f'netbox_interface_sync.{model._meta.label_lower}'.encode()) - 2 ** 31
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', (model_key, device_id))
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s, %s)', (model_key, device_id))
+    else:
+        lock_key = f'netbox_interface_sync:sync_lock:{model._meta.label_lower}:{device_id}'
+        token = uuid.uuid4().hex
+        acquired = cache.add(lock_key, token, SYNC_LOCK_TIMEOUT)
+        try:
+            yield acquired
+        finally:
+            # Do not release a lock that has expired and been taken over by another synchronization
+            if acquired and cache.get(lock_key) == token:
+                cache.delete(lock_key)
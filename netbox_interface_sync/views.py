@@ -1,24 +1,36 @@
+import hashlib
 from collections import namedtuple
-from typing import Type, Tuple
+from typing import List, Optional, Type, Tuple
 
+import attr
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
 from django.views.generic import View
 from dcim.models import (Device, Interface, InterfaceTemplate, PowerPort, PowerPortTemplate, ConsolePort,
                          ConsolePortTemplate, ConsoleServerPort, ConsoleServerPortTemplate, DeviceBay,
                          DeviceBayTemplate, FrontPort, FrontPortTemplate, PowerOutlet, PowerOutletTemplate, RearPort,
                          RearPortTemplate)
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.conf import settings
 from django.contrib import messages
 
 from netbox.models import PrimaryModel
 from dcim.constants import VIRTUAL_IFACE_TYPES
 
-from . import comparison
-from .utils import get_permissions_for_model, make_integer_list, human_sorted
-
-config = settings.PLUGINS_CONFIG['netbox_interface_sync']
+from . import Config, comparison
+from .plugin_config import get_config
+from .utils import chunked, get_permissions_for_model, make_integer_list, human_sorted, sync_lock
+
+# How long the progress of an interrupted synchronization is kept (in seconds)
+SYNC_PROGRESS_TIMEOUT = 24 * 60 * 60
+# Tag of the message shown when a synchronization is rejected because another one holds the lock
+SYNC_LOCKED_MESSAGE_TAG = "sync-locked"
+COMPARISON_ROW_TEMPLATE = "netbox_interface_sync/comparison_row.html"
+# How long a rendered comparison table row is cached (in seconds)
+COMPARISON_ROW_CACHE_TIMEOUT = 7 * 24 * 60 * 60
 ComparisonTableRow = namedtuple('ComparisonTableRow', ('component_template', 'component'))
 
 
@@ -51,20 +63,14 @@ class GenericComparisonView(PermissionRequiredMixin, View):
         self.device = get_object_or_404(Device, id=device_id)
         component_templates = self.obj_template_model.objects.filter(device_type_id=self.device.device_type.id)
         components = self.obj_model.objects.filter(device_id=device_id)
-        self.component_templates, self.components = self.filter_comparison_components(component_templates, components)
+        component_templates, components = self.filter_comparison_components(component_templates, components)
+        # Fetch only the columns that take part in the comparison
+        self.component_templates = comparison.project_queryset(component_templates)
+        self.components = comparison.project_queryset(components)
         self.comparison_component_templates = [comparison.from_netbox_object(obj) for obj in self.component_templates]
         self.comparison_components = [comparison.from_netbox_object(obj) for obj in self.components]
 
-        name_comparison_config = config['name_comparison']
-
-        def name_key(obj_name: str) -> str:
-            name = obj_name
-            if name_comparison_config.get('case-insensitive'):
-                name = name.lower()
-            if name_comparison_config.get('space-insensitive'):
-                name = name.replace(' ', '')
-            return name
-
+        name_key = get_config().name_key
         component_templates_dict = {name_key(obj.name): obj for obj in self.comparison_component_templates}
         components_dict = {name_key(obj.name): obj for obj in self.comparison_components}
 
@@ -76,57 +82,202 @@ class GenericComparisonView(PermissionRequiredMixin, View):
             for component_name in human_sorted(set().union(component_templates_dict.keys(), components_dict.keys()))
         )
 
+    @staticmethod
+    def _get_comparison_row_key(row: ComparisonTableRow, template_digest: str) -> str:
+        """
+        Cache key of a rendered comparison table row. It changes whenever the compared records,
+        the display settings, the row template or the plugin version (and so the code building the row) change
+        """
+        row_data = (
+            Config.version,
+            template_digest,
+            get_config().sync_descriptions,
+            tuple(
+                (obj.__class__.__name__, attr.astuple(obj, recurse=True)) if obj else None
+                for obj in row
+            ),
+        )
+        return f"netbox_interface_sync:comparison_row:{hashlib.sha256(repr(row_data).encode()).hexdigest()}"
+
+    def _render_comparison_rows(self) -> List[str]:
+        """Renders the comparison table rows, reusing cached fragments of the rows that have not changed"""
+        row_template = get_template(COMPARISON_ROW_TEMPLATE)
+        template_digest = hashlib.sha256(getattr(row_template, "template", row_template).source.encode()).hexdigest()
+        row_keys = [self._get_comparison_row_key(row, template_digest) for row in self.comparison_table]
+        cached_rows = cache.get_many(row_keys)
+
+        rendered_rows = {}
+        for key, row in zip(row_keys, self.comparison_table):
+            if key not in cached_rows and key not in rendered_rows:
+                rendered_rows[key] = row_template.render({
+                    "component_template": row.component_template,
+                    "component": row.component,
+                })
+        if rendered_rows:
+            cache.set_many(rendered_rows, COMPARISON_ROW_CACHE_TIMEOUT)
+
+        cached_rows.update(rendered_rows)
+        return [mark_safe(cached_rows[key]) for key in row_keys]
+
     def get(self, request, device_id):
         self._fetch_comparison_objects(device_id)
 
         return render(request, "netbox_interface_sync/components_comparison.html", {
             "component_type_name": self.obj_model._meta.verbose_name_plural,
-            "comparison_items": self.comparison_table,
+            "comparison_rows": self._render_comparison_rows(),
             "templates_count": len(self.comparison_component_templates),
             "components_count": len(self.comparison_components),
             "device": self.device,
+            "pending_sync": self._get_interrupted_sync(device_id),
         })
 
-    def post(self, request, device_id):
-        components_to_add = make_integer_list(request.POST.getlist("add"))
-        components_to_delete = make_integer_list(request.POST.getlist("remove"))
-        components_to_sync = make_integer_list(request.POST.getlist("sync"))
-        if not any((components_to_add, components_to_delete, components_to_sync)):
-            messages.warning(request, "No actions selected")
-            return redirect(request.path)
-
-        self._fetch_comparison_objects(device_id)
-
-        component_ids_to_delete = []
-        components_to_bulk_create = []
-        synced_count = 0
+    def _get_interrupted_sync(self, device_id: int) -> Optional[dict]:
+        """
+        Returns the progress of an interrupted synchronization of the device components, if there is one.
+        Progress of a synchronization that is still running (and holds the lock) is not returned
+        """
+        progress = cache.get(self._get_sync_progress_key(device_id))
+        if not progress:
+            return None
+        with sync_lock(self.obj_model, device_id) as acquired:
+            return progress if acquired else None
+
+    def get_component_fields(self, template: comparison.BaseComparison, sync: bool = False) -> dict:
+        """
+        Override this in the inherited View to resolve fields that refer to other components of the device
+        :param template: comparison object of the component template
+        :param sync: if True, returns fields for syncing an existing component, otherwise - for creating a new one.
+        """
+        return template.get_fields_for_netbox_component(sync=sync)
+
+    def check_sync_dependencies(self, progress: dict) -> Optional[str]:
+        """
+        Override this in the inherited View to check that the planned actions can be applied to the device.
+        Returns an error message if they cannot
+        """
+        return None
+
+    def _get_sync_progress_key(self, device_id: int) -> str:
+        """Cache key under which the progress of the device components synchronization is stored"""
+        return f"netbox_interface_sync:sync_progress:{self.obj_model._meta.label_lower}:{device_id}"
+
+    def _plan_sync(self, components_to_add: List[int], components_to_delete: List[int],
+                   components_to_sync: List[int]) -> dict:
+        """
+        Resolves the selected actions against the comparison table.
+        Returns the synchronization progress: IDs of pending actions and counters of completed ones
+        """
+        progress = {"remove": [], "sync": [], "add": [], "deleted": 0, "synced": 0, "created": 0}
         for template, component in self.comparison_table:
-            if template and (template.id in components_to_add):
+            if (template and not component) and (template.id in components_to_add):
                 # Add component to the device from the template
-                components_to_bulk_create.append(
-                    self.obj_model(device=self.device, **template.get_fields_for_netbox_component())
-                )
+                progress["add"].append(template.id)
             elif component and (component.id in components_to_delete):
                 # Delete component from the device
-                component_ids_to_delete.append(component.id)
+                progress["remove"].append(component.id)
             elif (template and component) and (component.id in components_to_sync):
                 # Update component attributes from the template
-                synced_count += self.components.filter(id=component.id).update(
-                    **template.get_fields_for_netbox_component(sync=True)
-                )
+                progress["sync"].append(component.id)
+        return progress
+
+    def _apply_sync(self, progress: dict, progress_key: str):
+        """
+        Applies the pending actions in chunks of `sync_batch_size`, each in its own transaction.
+        The progress is saved after every committed chunk, so that an interrupted synchronization
+        can be resumed without repeating the work already done
+        """
+        batch_size = get_config().sync_batch_size
+        # Look up the actions in the actual comparison table, so that resumed actions stay idempotent
+        existing_component_ids = {component.id for _, component in self.comparison_table if component}
+        templates_to_sync = {
+            component.id: template for template, component in self.comparison_table if template and component
+        }
+        templates_to_add = {
+            template.id: template for template, component in self.comparison_table if template and not component
+        }
+
+        for chunk in chunked(list(progress["remove"]), batch_size):
+            with transaction.atomic():
+                progress["deleted"] += self.obj_model.objects.filter(
+                    id__in=[component_id for component_id in chunk if component_id in existing_component_ids]
+                ).delete()[0]
+            progress["remove"] = progress["remove"][len(chunk):]
+            cache.set(progress_key, progress, SYNC_PROGRESS_TIMEOUT)
+
+        for chunk in chunked(list(progress["sync"]), batch_size):
+            with transaction.atomic():
+                for component_id in chunk:
+                    template = templates_to_sync.get(component_id)
+                    if template:
+                        progress["synced"] += self.components.filter(id=component_id).update(
+                            **self.get_component_fields(template, sync=True)
+                        )
+            progress["sync"] = progress["sync"][len(chunk):]
+            cache.set(progress_key, progress, SYNC_PROGRESS_TIMEOUT)
+
+        for chunk in chunked(list(progress["add"]), batch_size):
+            with transaction.atomic():
+                progress["created"] += len(self.obj_model.objects.bulk_create([
+                    self.obj_model(device=self.device, **self.get_component_fields(templates_to_add[template_id]))
+                    for template_id in chunk if template_id in templates_to_add
+                ]))
+            progress["add"] = progress["add"][len(chunk):]
+            cache.set(progress_key, progress, SYNC_PROGRESS_TIMEOUT)
 
-        deleted_count = self.obj_model.objects.filter(id__in=component_ids_to_delete).delete()[0]
-        created_count = len(self.obj_model.objects.bulk_create(components_to_bulk_create))
+    def post(self, request, device_id):
+        progress_key = self._get_sync_progress_key(device_id)
+        resume = bool(request.POST.get("resume"))
+        if not resume:
+            components_to_add = make_integer_list(request.POST.getlist("add"))
+            components_to_delete = make_integer_list(request.POST.getlist("remove"))
+            components_to_sync = make_integer_list(request.POST.getlist("sync"))
+            if not any((components_to_add, components_to_delete, components_to_sync)):
+                messages.warning(request, "No actions selected")
+                return redirect(request.path)
 
-        # Generating result message
         component_type_name = self.obj_model._meta.verbose_name_plural
+        # Synchronizations of the same components of the same device are serialized, other ones run in parallel
+        with sync_lock(self.obj_model, device_id) as acquired:
+            if not acquired:
+                messages.error(
+                    request, f"Another synchronization of {component_type_name} of this device is in progress, "
+                             f"try again later",
+                    extra_tags=SYNC_LOCKED_MESSAGE_TAG
+                )
+                return redirect(request.path)
+
+            if resume:
+                progress = cache.get(progress_key)
+                if not progress:
+                    messages.warning(request, "There is no interrupted synchronization to resume")
+                    return redirect(request.path)
+
+            # Read the device state only under the lock, so that actions are planned against the latest state
+            self._fetch_comparison_objects(device_id)
+
+            if not resume:
+                progress = self._plan_sync(components_to_add, components_to_delete, components_to_sync)
+            error = self.check_sync_dependencies(progress)
+            if error:
+                messages.error(request, error)
+                return redirect(request.path)
+            if not resume:
+                cache.set(progress_key, progress, SYNC_PROGRESS_TIMEOUT)
+            try:
+                self._apply_sync(progress, progress_key)
+            finally:
+                # Drop the progress once the synchronization has completed or failed with an error: resuming a failed
+                # one would only replay the same failure. Progress survives only if the worker itself was interrupted
+                cache.delete(progress_key)
+
+        # Generating result message
         message = []
-        if synced_count > 0:
-            message.append(f"synced {synced_count} {component_type_name}")
-        if created_count > 0:
-            message.append(f"created {created_count} {component_type_name}")
-        if deleted_count > 0:
-            message.append(f"deleted {deleted_count} {component_type_name}")
+        if progress["synced"] > 0:
+            message.append(f"synced {progress['synced']} {component_type_name}")
+        if progress["created"] > 0:
+            message.append(f"created {progress['created']} {component_type_name}")
+        if progress["deleted"] > 0:
+            message.append(f"deleted {progress['deleted']} {component_type_name}")
         messages.success(request, "; ".join(message).capitalize())
 
         return redirect(request.path)
@@ -151,7 +302,7 @@ class InterfaceComparisonView(GenericComparisonView):
 
     @staticmethod
     def filter_comparison_components(component_templates: QuerySet, components: QuerySet) -> Tuple[QuerySet, QuerySet]:
-        if config["exclude_virtual_interfaces"]:
+        if get_config().exclude_virtual_interfaces:
             components = components.exclude(type__in=VIRTUAL_IFACE_TYPES)
             component_templates = component_templates.exclude(type__in=VIRTUAL_IFACE_TYPES)
         return component_templates, components
@@ -168,134 +319,40 @@ class PowerOutletComparisonView(GenericComparisonView):
     obj_model = PowerOutlet
     obj_template_model = PowerOutletTemplate
 
-    def post(self, request, device_id):
-        device = get_object_or_404(Device.objects.filter(id=device_id))
-
-        poweroutlets = device.poweroutlets.all()
-        poweroutlets_templates = PowerOutletTemplate.objects.filter(device_type=device.device_type)
-
-        # Generating result message
-        message = []
-        created = 0
-        updated = 0
-        fixed = 0
-
-        remove_from_device = filter(
-            lambda i: i in poweroutlets.values_list("id", flat=True),
-            map(int, filter(lambda x: x.isdigit(), request.POST.getlist("remove")))
-        )
-
-        # Remove selected power outlets from the device and count them
-        deleted = PowerOutlet.objects.filter(id__in=remove_from_device).delete()[0]
-
-        # Get device power ports to check dependency between power outlets
-        device_pp = PowerPort.objects.filter(device_id=device.id)
-
-        matching = {}
-        mismatch = False
-        for i in poweroutlets_templates:
-            found = False
-            if i.power_port_id is not None:
-                ppt = PowerPortTemplate.objects.get(id=i.power_port_id)
-                for pp in device_pp:
-                    if pp.name == ppt.name:
-                        # Save matching to add the correct power port later
-                        matching[i.id] = pp.id
-                        found = True
-
-                # If at least one power port is not found in device there is a dependency
-                # Better not to sync at all
-                if not found:
-                    mismatch = True
-                    break
-
-        if not mismatch:
-            add_to_device = filter(
-                lambda i: i in poweroutlets_templates.values_list("id", flat=True),
-                map(int, filter(lambda x: x.isdigit(), request.POST.getlist("add")))
-            )
-
-            # Add selected component to the device and count them
-            add_to_device_component = PowerOutletTemplate.objects.filter(id__in=add_to_device)
-
-            bulk_create = []
-            updated = 0
-            keys_to_avoid = ["id"]
-
-            if not config["compare_description"]:
-                keys_to_avoid.append("description")
-
-            for i in add_to_device_component.values():
-                to_create = False
-
-                try:
-                    # If power outlets already exists, update and do not recreate
-                    po = device.poweroutlets.get(name=i["name"])
-                except PowerOutlet.DoesNotExist:
-                    po = PowerOutlet()
-                    po.device = device
-                    to_create = True
-
-                # Copy all fields from template
-                for k in i.keys():
-                    if k not in keys_to_avoid:
-                        setattr(po, k, i[k])
-                po.power_port_id = matching.get(i["id"], None)
-
-                if to_create:
-                    bulk_create.append(po)
-                else:
-                    po.save()
-                    updated += 1
-
-            created = len(PowerOutlet.objects.bulk_create(bulk_create))
-
-            # Getting and validating a list of components to rename
-            fix_name_components = filter(lambda i: str(i.id) in request.POST.getlist("fix_name"), poweroutlets)
-
-            # Casting component templates into Unified objects for proper comparison with component for renaming
-            unified_component_templates = [
-                PowerOutletComparison(i.id, i.name, i.label, i.description, i.type, i.get_type_display(),
-                                      power_port_name=PowerPortTemplate.objects.get(id=i.power_port_id).name
-                                      if i.power_port_id is not None else "",
-                                      feed_leg=i.feed_leg, is_template=True)
-                for i in poweroutlets_templates]
-
-            # Rename selected power outlets
-            fixed = 0
-            for component in fix_name_components:
-                unified_poweroutlet = PowerOutletComparison(
-                    component.id, component.name, component.label, component.description, component.type,
-                    component.get_type_display(),
-                    power_port_name=PowerPort.objects.get(id=component.power_port_id).name
-                    if component.power_port_id is not None else "",
-                    feed_leg=component.feed_leg
-                )
-                try:
-                    # Try to extract a component template with the corresponding name
-                    corresponding_template = unified_component_templates[
-                        unified_component_templates.index(unified_poweroutlet)
-                    ]
-                    component.name = corresponding_template.name
-                    component.save()
-                    fixed += 1
-                except ValueError:
-                    pass
-        else:
-            messages.error(request, "Dependency detected, sync power ports first!")
-
-        if created > 0:
-            message.append(f"created {created} power outlets")
-        if updated > 0:
-            message.append(f"updated {updated} power outlets")
-        if deleted > 0:
-            message.append(f"deleted {deleted} power outlets")
-        if fixed > 0:
-            message.append(f"fixed {fixed} power outlets")
-
-        messages.info(request, "; ".join(message).capitalize())
-
-        return redirect(request.path)
+    def _fetch_comparison_objects(self, device_id: int):
+        super()._fetch_comparison_objects(device_id)
+        # Power ports of the device, which the power outlets created or synced from the templates are bound to
+        name_key = get_config().name_key
+        self.device_power_ports = {
+            name_key(power_port.name): power_port
+            for power_port in PowerPort.objects.filter(device_id=device_id).only("id", "name")
+        }
+
+    def _get_device_power_port(self, template: comparison.BaseComparison) -> Optional[PowerPort]:
+        """Returns the device power port with the name of the template's power port"""
+        if template.power_port is None:
+            return None
+        return self.device_power_ports.get(get_config().name_key(template.power_port.name))
+
+    def get_component_fields(self, template: comparison.BaseComparison, sync: bool = False) -> dict:
+        component_fields = super().get_component_fields(template, sync=sync)
+        component_fields["power_port"] = self._get_device_power_port(template)
+        return component_fields
+
+    def check_sync_dependencies(self, progress: dict) -> Optional[str]:
+        # Power outlets are added by template IDs and synced by component IDs
+        templates_to_add = {
+            template.id: template for template, component in self.comparison_table if template and not component
+        }
+        templates_to_sync = {
+            component.id: template for template, component in self.comparison_table if template and component
+        }
+        templates = [templates_to_add.get(template_id) for template_id in progress["add"]]
+        templates.extend(templates_to_sync.get(component_id) for component_id in progress["sync"])
+        for template in templates:
+            if template and template.power_port is not None and self._get_device_power_port(template) is None:
+                return "Dependency detected, sync power ports first!"
+        return None
 
 
 class RearPortComparisonView(GenericComparisonView):
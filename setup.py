@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import find_packages, setup
 
 with open('README.md', encoding='utf-8') as f:
     long_description = f.read()
@@ -13,7 +13,7 @@ setup(
     author_email='drygdryg2014@yandex.com',
     license='GPL-3.0',
     install_requires=['attrs>=21.1.0'],
-    packages=["netbox_interface_sync"],
+    packages=find_packages(include=["netbox_interface_sync", "netbox_interface_sync.*"]),
     package_data={"netbox_interface_sync": ["templates/netbox_interface_sync/*.html"]},
     zip_safe=False
 )